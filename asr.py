@@ -4,47 +4,175 @@
 支持实时接收服务端的转录结果
 """
 
-import requests
+import aiohttp
+import asyncio
 import json
+import orjson
 import time
 import argparse
+import os
 import sys
-from typing import Optional
+from typing import AsyncIterator, Optional
 from urllib.parse import urlencode
 
 
+# 转录质量档位对应的集束搜索大小
+QUALITY_BEAM_SIZES = {"fast": 1, "balanced": 2, "best": 5}
+
+# 连接池大小：单个服务器的最大连接数 / 最多保持连接的服务器数
+# 每个 SSE 流在整个转录期间占用一个连接，单个服务器的连接数决定了能同时转录多少个文件
+POOL_MAXSIZE = 32
+POOL_CONNECTIONS = 16
+# 建立连接失败时的重试次数与退避系数
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 0.3
+# 读取 SSE 响应流的块大小
+SSE_READ_SIZE = 4096
+# 保存结果：文件写缓冲大小，每写入多少段刷新一次
+WRITE_BUFFER_SIZE = 1 << 16
+FLUSH_EVERY = 32
+
+
+class _ResultWriter:
+    """增量保存转录结果：逐段追加写入文本文件，转录完成时写出 JSON 详细信息"""
+    
+    def __init__(self, file_path: Optional[str], segments: list):
+        self.file_path = file_path
+        self.segments = segments
+        self._f = None
+        self._count = 0
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def handle(self, data: dict):
+        """根据服务端事件写入结果"""
+        if not self.file_path:
+            return
+        
+        event_type = data.get('type')
+        try:
+            if event_type == 'segment':
+                # 收到第一段时才创建文件，没有任何转录结果时不覆盖已有文件
+                if self._f is None:
+                    self._f = open(self.file_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE)
+                self._f.write(data.get('text', '') + "\n")
+                self._count += 1
+                # 定期刷新到系统缓存，中途崩溃也只丢失最近几段
+                if self._count % FLUSH_EVERY == 0:
+                    self._f.flush()
+                    
+            elif event_type == 'complete' and self._f is not None:
+                self._close_file()
+                print(f"💾 文本已保存到: {self.file_path}")
+                self._save_json()
+                
+        except OSError as e:
+            print(f"⚠️  保存文件失败: {e}")
+            self._discard()
+    
+    def close(self):
+        """关闭文本文件；未收到完成事件时文件中只有部分结果"""
+        if self._f is not None:
+            self._close_file()
+            print(f"⚠️  转录未完成，已写入的部分结果保留在: {self.file_path}")
+    
+    def _close_file(self):
+        self._f.close()
+        self._f = None
+    
+    def _discard(self):
+        """写入失败后关闭文件并停止保存，之后不再提示部分结果"""
+        if self._f is not None:
+            try:
+                self._f.close()
+            except OSError:
+                pass
+            self._f = None
+        self.file_path = None
+    
+    def _save_json(self):
+        """保存详细信息到JSON文件"""
+        json_file = self.file_path.rsplit('.', 1)[0] + '_detailed.json'
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'total_segments': len(self.segments),
+                'segments': self.segments,
+                'full_text': "\n".join(segment['text'] for segment in self.segments)
+            }, f, ensure_ascii=False, indent=2)
+        print(f"📄 详细信息已保存到: {json_file}")
+
+
 class ASRClient:
     """语音转录客户端"""
     
     def __init__(self, server_url: str = "http://localhost:8000"):
         self.server_url = server_url.rstrip('/')
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    async def __aenter__(self):
+        # 所有请求共享同一个连接池，转录可能持续很久，只限制单次读取的等待时间
+        # keep-alive 连接在测试连接、重试和多个文件之间复用，省去重复的 TCP/TLS 握手
+        connector = aiohttp.TCPConnector(limit=POOL_CONNECTIONS * POOL_MAXSIZE, limit_per_host=POOL_MAXSIZE)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=None, sock_read=300)
+        )
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    async def close(self):
+        """关闭连接池"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+    
+    async def _get(self, url: str, **kwargs) -> aiohttp.ClientResponse:
+        """发送 GET 请求，连接失败时按指数退避重试"""
+        for attempt in range(RETRY_TOTAL + 1):
+            try:
+                return await self._session.get(url, **kwargs)
+            except aiohttp.ClientConnectorError:
+                if attempt == RETRY_TOTAL:
+                    raise
+                await asyncio.sleep(RETRY_BACKOFF * (2 ** attempt))
         
-    def test_connection(self) -> bool:
+    async def test_connection(self) -> bool:
         """测试服务器连接"""
         try:
-            response = requests.get(f"{self.server_url}/", timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                print(f"✅ 连接成功: {data.get('message', '服务器正常')}")
-                return True
-            else:
-                print(f"❌ 服务器响应异常: {response.status_code}")
-                return False
-        except requests.exceptions.RequestException as e:
+            async with await self._get(
+                f"{self.server_url}/", timeout=aiohttp.ClientTimeout(total=5)
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    print(f"✅ 连接成功: {data.get('message', '服务器正常')}")
+                    return True
+                else:
+                    print(f"❌ 服务器响应异常: {response.status}")
+                    return False
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             print(f"❌ 连接失败: {e}")
             return False
     
-    def transcribe_file(
+    async def transcribe_file(
         self,
         media_path: str,
         model_size: str = "medium",
         device: str = "cuda",
-        compute_type: str = "float16",
-        beam_size: int = 5,
+        compute_type: str = "int8_float16",
+        beam_size: int = 1,
         language: str = "zh",
-        save_to_file: Optional[str] = None
+        vad_filter: bool = True,
+        batched: bool = False,
+        save_to_file: Optional[str] = None,
+        show_name: bool = False
     ):
-        """转录本地文件"""
+        """转录本地文件；show_name 为 True 时在每段结果前标注文件名（多个文件同时转录时使用）"""
         
         print(f"🎯 开始转录文件: {media_path}")
         print(f"📋 参数: model={model_size}, device={device}, language={language}")
@@ -57,109 +185,114 @@ class ASRClient:
             "device": device,
             "compute_type": compute_type,
             "beam_size": beam_size,
-            "language": language
+            "language": language,
+            "vad_filter": str(vad_filter).lower(),
+            "batched": str(batched).lower()
         }
         
         url = f"{self.server_url}/asr?{urlencode(params)}"
         
         try:
             # 发送 SSE 请求
-            response = requests.get(url, stream=True, timeout=300)
-            response.raise_for_status()
-            
-            # 处理流式响应
-            segments = []
-            total_text = ""
-            
-            for line in response.iter_lines(decode_unicode=True):
-                if line.startswith('data: '):
-                    try:
-                        data = json.loads(line[6:])  # 去掉 'data: ' 前缀
-                        self._handle_event(data, segments)
-                        
-                        # 收集文本用于保存
-                        if data.get('type') == 'segment':
-                            total_text += data.get('text', '') + "\n"
-                            
-                    except json.JSONDecodeError as e:
-                        print(f"⚠️  解析JSON失败: {e}")
-            
-            # 保存结果到文件
-            if save_to_file and total_text.strip():
-                self._save_to_file(save_to_file, total_text.strip(), segments)
+            async with await self._get(url) as response:
+                response.raise_for_status()
                 
-        except requests.exceptions.RequestException as e:
+                # 处理流式响应，结果边接收边写入文件
+                segments = []
+                prefix = f"[{os.path.basename(media_path)}] " if show_name else ""
+                with _ResultWriter(save_to_file, segments) as writer:
+                    async for data in self._iter_events(response):
+                        self._handle_event(data, segments, prefix)
+                        writer.handle(data)
+                
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             print(f"❌ 请求失败: {e}")
-        except KeyboardInterrupt:
-            print("\n\n⏹️  用户中断转录")
         except Exception as e:
             print(f"❌ 未知错误: {e}")
     
-    def upload_and_transcribe(
+    async def upload_and_transcribe(
         self,
         file_path: str,
         model_size: str = "medium",
         device: str = "cuda",
-        compute_type: str = "float16",
-        beam_size: int = 5,
+        compute_type: str = "int8_float16",
+        beam_size: int = 1,
         language: str = "zh",
-        save_to_file: Optional[str] = None
+        vad_filter: bool = True,
+        batched: bool = False,
+        save_to_file: Optional[str] = None,
+        show_name: bool = False
     ):
-        """上传文件并转录"""
+        """上传文件并转录；show_name 为 True 时在每段结果前标注文件名"""
         
         print(f"📤 上传并转录文件: {file_path}")
         print(f"📋 参数: model={model_size}, device={device}, language={language}")
         print("=" * 60)
         
         try:
-            # 准备文件上传
+            # 以原始请求体上传文件内容，服务端边接收边解码
             with open(file_path, 'rb') as f:
-                files = {'file': (file_path, f, 'application/octet-stream')}
                 params = {
+                    "file_name": os.path.basename(file_path),
                     "model_size": model_size,
                     "device": device,
                     "compute_type": compute_type,
                     "beam_size": beam_size,
-                    "language": language
+                    "language": language,
+                    "vad_filter": str(vad_filter).lower(),
+                    "batched": str(batched).lower()
                 }
                 
-                url = f"{self.server_url}/asr/upload"
-                
-                # 发送上传请求
-                response = requests.post(url, files=files, params=params, stream=True, timeout=300)
-                response.raise_for_status()
+                url = f"{self.server_url}/asr/stream"
                 
-                # 处理流式响应
-                segments = []
-                total_text = ""
-                
-                for line in response.iter_lines(decode_unicode=True):
-                    if line.startswith('data: '):
-                        try:
-                            data = json.loads(line[6:])
-                            self._handle_event(data, segments)
-                            
-                            if data.get('type') == 'segment':
-                                total_text += data.get('text', '') + "\n"
-                                
-                        except json.JSONDecodeError as e:
-                            print(f"⚠️  解析JSON失败: {e}")
-                
-                # 保存结果
-                if save_to_file and total_text.strip():
-                    self._save_to_file(save_to_file, total_text.strip(), segments)
+                # 发送上传请求（文件分块读取发送，不一次性读入内存）
+                async with self._session.post(
+                    url, data=f, params=params, headers={"Content-Type": "application/octet-stream"}
+                ) as response:
+                    response.raise_for_status()
+                    
+                    # 处理流式响应，结果边接收边写入文件
+                    segments = []
+                    prefix = f"[{os.path.basename(file_path)}] " if show_name else ""
+                    with _ResultWriter(save_to_file, segments) as writer:
+                        async for data in self._iter_events(response):
+                            self._handle_event(data, segments, prefix)
+                            writer.handle(data)
                     
         except FileNotFoundError:
             print(f"❌ 文件不存在: {file_path}")
-        except requests.exceptions.RequestException as e:
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             print(f"❌ 上传失败: {e}")
-        except KeyboardInterrupt:
-            print("\n\n⏹️  用户中断转录")
         except Exception as e:
             print(f"❌ 未知错误: {e}")
     
-    def _handle_event(self, data: dict, segments: list):
-        """处理服务端事件"""
+    async def _iter_events(self, response: aiohttp.ClientResponse) -> AsyncIterator[dict]:
+        """按 SSE 帧（空行分隔）解析响应流，逐个返回事件数据"""
+        buf = bytearray()
+        
+        async for chunk in response.content.iter_chunked(SSE_READ_SIZE):
+            buf += chunk
+            while True:
+                end = buf.find(b"\n\n")
+                if end < 0:
+                    break
+                event = bytes(buf[:end])
+                del buf[:end + 2]
+                
+                # 一个事件可能包含多行 data，按规范用换行拼接；以 ':' 开头的注释行（心跳）忽略
+                payload = b"\n".join(
+                    line[5:].removeprefix(b" ") for line in event.split(b"\n") if line.startswith(b"data:")
+                )
+                if not payload:
+                    continue
+                
+                try:
+                    yield orjson.loads(payload)
+                except orjson.JSONDecodeError as e:
+                    print(f"⚠️  解析JSON失败: {e}")
+    
+    def _handle_event(self, data: dict, segments: list, prefix: str = ""):
+        """处理服务端事件，prefix 加在每段结果和错误信息之前"""
         event_type = data.get('type')
         
         if event_type == 'start':
@@ -180,7 +313,7 @@ class ASRClient:
             segment_id = data.get('segment_id', 0)
             
             # 实时显示转录结果
-            print(f"[{start:6.2f}s -> {end:6.2f}s] {text}")
+            print(f"{prefix}[{start:6.2f}s -> {end:6.2f}s] {text}")
             
             # 保存到列表
             segments.append({
@@ -204,76 +337,76 @@ class ASRClient:
             
         elif event_type == 'error':
             error_msg = data.get('error_message', '未知错误')
-            print(f"❌ 服务端错误: {error_msg}")
+            print(f"{prefix}❌ 服务端错误: {error_msg}")
+
+
+def _save_path(save_to_file: Optional[str], index: int, media_path: str, multiple: bool) -> Optional[str]:
+    """多个文件同时转录时，为每个文件生成独立的保存路径（加上序号，不同目录下的同名文件互不覆盖）"""
+    if not save_to_file or not multiple:
+        return save_to_file
+    base, ext = os.path.splitext(save_to_file)
+    stem = os.path.splitext(os.path.basename(media_path))[0]
+    return f"{base}_{index}_{stem}{ext or '.txt'}"
+
+
+async def run(args) -> int:
+    """并发转录所有文件，共享同一个连接池"""
+    async with ASRClient(args.server) as client:
+        # 测试连接
+        if not await client.test_connection():
+            print("💡 请确保服务器正在运行: python run.py")
+            return 1
+        
+        print()
+        
+        transcribe = client.upload_and_transcribe if args.upload else client.transcribe_file
+        multiple = len(args.media_paths) > 1
+        beam_size = args.beam_size or QUALITY_BEAM_SIZES[args.quality]
+        
+        # 执行转录，网络等待相互重叠
+        await asyncio.gather(*[
+            transcribe(
+                media_path,
+                model_size=args.model,
+                device=args.device,
+                compute_type=args.compute_type,
+                beam_size=beam_size,
+                language=args.language,
+                vad_filter=not args.no_vad,
+                batched=args.batched,
+                save_to_file=_save_path(args.save, index, media_path, multiple),
+                show_name=multiple
+            )
+            for index, media_path in enumerate(args.media_paths, 1)
+        ])
     
-    def _save_to_file(self, file_path: str, text: str, segments: list):
-        """保存结果到文件"""
-        try:
-            # 保存纯文本
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(text)
-            print(f"💾 文本已保存到: {file_path}")
-            
-            # 保存详细信息到JSON文件
-            json_file = file_path.rsplit('.', 1)[0] + '_detailed.json'
-            with open(json_file, 'w', encoding='utf-8') as f:
-                json.dump({
-                    'total_segments': len(segments),
-                    'segments': segments,
-                    'full_text': text
-                }, f, ensure_ascii=False, indent=2)
-            print(f"📄 详细信息已保存到: {json_file}")
-            
-        except Exception as e:
-            print(f"⚠️  保存文件失败: {e}")
+    return 0
 
 
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(description="语音转录客户端")
-    parser.add_argument("media_path", help="媒体文件路径")
+    parser.add_argument("media_paths", nargs="+", metavar="media_path", help="媒体文件路径（可指定多个，并发转录）")
     parser.add_argument("--server", default="http://localhost:8000", help="服务器地址")
     parser.add_argument("--model", default="medium", choices=["small", "medium", "large-v3"], help="模型大小")
     parser.add_argument("--device", default="cuda", choices=["cuda", "cpu"], help="设备类型")
-    parser.add_argument("--compute-type", default="float16", choices=["float16", "int8_float16", "int8"], help="计算类型")
-    parser.add_argument("--beam-size", type=int, default=5, help="集束搜索大小")
+    parser.add_argument("--compute-type", default="int8_float16", choices=["float16", "int8_float16", "int8"], help="计算类型（默认 int8_float16，可用 float16 关闭量化）")
+    parser.add_argument("--quality", default="fast", choices=list(QUALITY_BEAM_SIZES), help="转录质量 (fast/balanced/best 对应集束搜索大小 1/2/5)")
+    parser.add_argument("--beam-size", type=int, help="集束搜索大小（指定后覆盖 --quality）")
     parser.add_argument("--language", default="zh", help="语言代码")
+    parser.add_argument("--no-vad", action="store_true", help="关闭 VAD，转录完整音频（包括静音片段）")
+    parser.add_argument("--batched", action="store_true", help="服务端与其他并发请求合并批量推理（结果在转录完成后一次性返回）")
     parser.add_argument("--upload", action="store_true", help="上传文件到服务器")
-    parser.add_argument("--save", help="保存结果到文件")
+    parser.add_argument("--save", help="保存结果到文件（多个文件时自动追加序号和文件名）")
     
     args = parser.parse_args()
+    if args.batched and args.no_vad:
+        parser.error("--batched 需要开启 VAD，不能与 --no-vad 同时使用")
     
-    # 创建客户端
-    client = ASRClient(args.server)
-    
-    # 测试连接
-    if not client.test_connection():
-        print("💡 请确保服务器正在运行: python run.py")
-        sys.exit(1)
-    
-    print()
-    
-    # 执行转录
-    if args.upload:
-        client.upload_and_transcribe(
-            file_path=args.media_path,
-            model_size=args.model,
-            device=args.device,
-            compute_type=args.compute_type,
-            beam_size=args.beam_size,
-            language=args.language,
-            save_to_file=args.save
-        )
-    else:
-        client.transcribe_file(
-            media_path=args.media_path,
-            model_size=args.model,
-            device=args.device,
-            compute_type=args.compute_type,
-            beam_size=args.beam_size,
-            language=args.language,
-            save_to_file=args.save
-        )
+    try:
+        sys.exit(asyncio.run(run(args)))
+    except KeyboardInterrupt:
+        print("\n\n⏹️  用户中断转录")
 
 
 if __name__ == "__main__":
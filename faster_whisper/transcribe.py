@@ -374,6 +374,158 @@ class BatchedInferencePipeline:
             - an instance of TranscriptionInfo
         """
 
+        arguments = locals()
+        for name in ("self", "log_progress", "batch_size"):
+            arguments.pop(name)
+
+        (
+            features,
+            tokenizer,
+            chunks_metadata,
+            options,
+            info,
+            clip_timestamps,
+        ) = self._prepare_transcription(**arguments)
+
+        segments = self._batched_segments_generator(
+            features,
+            tokenizer,
+            chunks_metadata,
+            batch_size,
+            options,
+            log_progress,
+        )
+        segments = restore_speech_timestamps(
+            segments, clip_timestamps, self.model.feature_extractor.sampling_rate
+        )
+
+        return segments, info
+
+    def transcribe_many(
+        self,
+        audios: List[Union[str, BinaryIO, np.ndarray]],
+        batch_size: int = 8,
+        log_progress: bool = False,
+        **kwargs,
+    ) -> List[Tuple[List[Segment], TranscriptionInfo]]:
+        """transcribe several audios together, sharing decoding batches across them.
+
+        Each audio is prepared exactly as in `transcribe` (VAD, feature extraction and
+        language detection), then the chunks of all audios with the same language are
+        decoded together in batches of `batch_size`.
+
+        Arguments:
+            audios: List of paths to input files (or file-like objects), or audio waveforms.
+            batch_size: the maximum number of parallel requests to model for decoding.
+            log_progress: whether to show progress bar or not.
+            **kwargs: Any other argument of `transcribe`, applied to every audio.
+                `word_timestamps` is not supported.
+
+        Returns:
+          A list with one tuple per audio, in the input order:
+
+            - a list of transcribed segments
+            - an instance of TranscriptionInfo
+        """
+        if kwargs.get("word_timestamps"):
+            raise ValueError("word_timestamps is not supported by transcribe_many")
+
+        bound = signature(self.transcribe).bind(None, **kwargs)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+        for name in ("audio", "log_progress", "batch_size"):
+            arguments.pop(name)
+
+        prepared = [self._prepare_transcription(audio, **arguments) for audio in audios]
+
+        # chunks sharing a language share the prompt, so they can be decoded together
+        groups = {}
+        for index, (features, _, _, _, info, _) in enumerate(prepared):
+            if len(features):
+                groups.setdefault(info.language, []).append(index)
+
+        outputs = [[] for _ in prepared]
+        pbar = tqdm(
+            total=sum(len(item[0]) for item in prepared),
+            disable=not log_progress,
+            position=0,
+        )
+        for indices in groups.values():
+            _, tokenizer, _, options, _, _ = prepared[indices[0]]
+            features = np.concatenate([prepared[index][0] for index in indices])
+            chunks_metadata = [
+                metadata for index in indices for metadata in prepared[index][2]
+            ]
+            owners = [index for index in indices for _ in prepared[index][0]]
+
+            for i in range(0, len(features), batch_size):
+                results = self.forward(
+                    features[i : i + batch_size],
+                    tokenizer,
+                    chunks_metadata[i : i + batch_size],
+                    options,
+                )
+                for owner, result in zip(owners[i : i + batch_size], results):
+                    outputs[owner].append(result)
+                pbar.update(len(results))
+
+        pbar.close()
+
+        transcriptions = []
+        for (_, _, _, options, info, clip_timestamps), results in zip(
+            prepared, outputs
+        ):
+            segments = [
+                _segment_from_output(seg_idx, segment, options)
+                for seg_idx, segment in enumerate(
+                    (segment for result in results for segment in result), start=1
+                )
+            ]
+            segments = restore_speech_timestamps(
+                segments, clip_timestamps, self.model.feature_extractor.sampling_rate
+            )
+            transcriptions.append((list(segments), info))
+
+        return transcriptions
+
+    def _prepare_transcription(
+        self,
+        audio: Union[str, BinaryIO, np.ndarray],
+        *,
+        language: Optional[str],
+        task: str,
+        beam_size: int,
+        best_of: int,
+        patience: float,
+        length_penalty: float,
+        repetition_penalty: float,
+        no_repeat_ngram_size: int,
+        temperature: Union[float, List[float], Tuple[float, ...]],
+        compression_ratio_threshold: Optional[float],
+        log_prob_threshold: Optional[float],
+        no_speech_threshold: Optional[float],
+        condition_on_previous_text: bool,
+        prompt_reset_on_temperature: float,
+        initial_prompt: Optional[Union[str, Iterable[int]]],
+        prefix: Optional[str],
+        suppress_blank: bool,
+        suppress_tokens: Optional[List[int]],
+        without_timestamps: bool,
+        max_initial_timestamp: float,
+        word_timestamps: bool,
+        prepend_punctuations: str,
+        append_punctuations: str,
+        multilingual: bool,
+        vad_filter: bool,
+        vad_parameters: Optional[Union[dict, VadOptions]],
+        max_new_tokens: Optional[int],
+        chunk_length: Optional[int],
+        clip_timestamps: Optional[List[dict]],
+        hallucination_silence_threshold: Optional[float],
+        hotwords: Optional[str],
+        language_detection_threshold: Optional[float],
+        language_detection_segments: int,
+    ):
         sampling_rate = self.model.feature_extractor.sampling_rate
 
         if multilingual and not self.model.model.is_multilingual:
@@ -551,17 +703,7 @@ class BatchedInferencePipeline:
             all_language_probs=all_language_probs,
         )
 
-        segments = self._batched_segments_generator(
-            features,
-            tokenizer,
-            chunks_metadata,
-            batch_size,
-            options,
-            log_progress,
-        )
-        segments = restore_speech_timestamps(segments, clip_timestamps, sampling_rate)
-
-        return segments, info
+        return features, tokenizer, chunks_metadata, options, info, clip_timestamps
 
     def _batched_segments_generator(
         self, features, tokenizer, chunks_metadata, batch_size, options, log_progress
@@ -579,23 +721,7 @@ class BatchedInferencePipeline:
             for result in results:
                 for segment in result:
                     seg_idx += 1
-                    yield Segment(
-                        seek=segment["seek"],
-                        id=seg_idx,
-                        text=segment["text"],
-                        start=round(segment["start"], 3),
-                        end=round(segment["end"], 3),
-                        words=(
-                            None
-                            if not options.word_timestamps
-                            else [Word(**word) for word in segment["words"]]
-                        ),
-                        tokens=segment["tokens"],
-                        avg_logprob=segment["avg_logprob"],
-                        no_speech_prob=segment["no_speech_prob"],
-                        compression_ratio=segment["compression_ratio"],
-                        temperature=options.temperatures[0],
-                    )
+                    yield _segment_from_output(seg_idx, segment, options)
 
                 pbar.update(1)
 
@@ -1827,6 +1953,28 @@ class WhisperModel:
         return language, language_probability, all_language_probs
 
 
+def _segment_from_output(
+    seg_idx: int, segment: dict, options: TranscriptionOptions
+) -> Segment:
+    return Segment(
+        seek=segment["seek"],
+        id=seg_idx,
+        text=segment["text"],
+        start=round(segment["start"], 3),
+        end=round(segment["end"], 3),
+        words=(
+            None
+            if not options.word_timestamps
+            else [Word(**word) for word in segment["words"]]
+        ),
+        tokens=segment["tokens"],
+        avg_logprob=segment["avg_logprob"],
+        no_speech_prob=segment["no_speech_prob"],
+        compression_ratio=segment["compression_ratio"],
+        temperature=options.temperatures[0],
+    )
+
+
 def restore_speech_timestamps(
     segments: Iterable[Segment],
     speech_chunks: List[dict],
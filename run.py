@@ -1,88 +1,488 @@
-from fastapi import FastAPI, Query, HTTPException, UploadFile, File
+from fastapi import FastAPI, Query, HTTPException, UploadFile, File, Request
 from fastapi.responses import StreamingResponse
-from faster_whisper import WhisperModel
+from faster_whisper import BatchedInferencePipeline, WhisperModel, decode_audio
 import time
 import os
-import json
+import orjson
 import asyncio
-from typing import Optional, AsyncGenerator
+import threading
+import argparse
+import subprocess
+import zlib
+from typing import Awaitable, Callable, Optional, AsyncGenerator, AsyncIterator
+import shutil
 import tempfile
 import uvicorn
+import numpy as np
 from pathlib import Path
+from dataclasses import astuple, dataclass
 
 
 app = FastAPI(title="语音转录服务", description="基于 faster-whisper 的实时语音转录 API")
 
-# 全局模型缓存
+# 音频格式
+AUDIO_SUFFIXES = ('.mp3', '.wav', '.m4a', '.aac', '.ogg', '.flac', '.wma')
+# 视频格式
+VIDEO_SUFFIXES = ('.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm', '.m4v', '.3gp')
+
+# 服务端默认模型配置的环境变量（由启动参数设置，--workers 启动的子进程同样可以读取）
+MODEL_CONFIG_ENV = "ASR_MODEL_CONFIG"
+
+# 全局模型缓存，最多保留的模型数（超出时淘汰最早加载的模型）
+MODEL_CACHE_SIZE = 8
 _model_cache = {}
+# 模型加载锁：按模型配置区分，同一个模型并发请求时只加载一次，不同模型互不阻塞
+_model_locks = {}
+_model_locks_guard = threading.Lock()
+_model_async_locks = {}
+
+# 上传文件分块读取的大小
+UPLOAD_CHUNK_SIZE = 1 << 20
+# 内存文件系统（tmpfs），上传内容的副本优先存放在这里，避免落盘
+SHM_DIR = "/dev/shm"
+# 需要随机读取（moov 信息可能在文件末尾）的容器格式，无法从管道解码
+SEEKABLE_SUFFIXES = ('.mp4', '.m4a', '.m4v', '.mov', '.3gp')
+
+# SSE 转录段的批量发送：缓冲超过该字节数或距上次发送超过该秒数时写出
+SSE_FLUSH_BYTES = 4096
+SSE_FLUSH_INTERVAL = 0.05
+# 长时间没有事件时（如等待批量推理）定期发送的 SSE 注释，避免客户端或代理因读超时断开
+SSE_KEEPALIVE = b": keep-alive\n\n"
+SSE_KEEPALIVE_INTERVAL = 15
+
+# ffmpeg 解码：采样率与线程数；未安装 ffmpeg 时回退到 PyAV 解码
+SAMPLE_RATE = 16000
+FFMPEG_THREADS = 4
+FFMPEG_PATH = shutil.which("ffmpeg")
+
+# SSE 响应头：禁止代理（nginx 等）与 CDN 缓冲，事件产生后立即送达客户端
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+    "Vary": "Accept-Encoding",
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Headers": "*",
+}
+# SSE 流的 gzip 压缩级别（中文 JSON 压缩率高，低级别即可获得大部分收益）
+SSE_GZIP_LEVEL = 6
+
+# 跨请求微批处理：最多合并的请求数、收集窗口（秒），以及单次送入模型的语音块数
+BATCH_MAX_REQUESTS = 4
+BATCH_WINDOW = 0.02
+BATCH_SIZE = 8
+
+# Silero VAD 参数：静音超过该时长才切分
+VAD_PARAMETERS = {"min_silence_duration_ms": 500}
 
 
 def get_file_type(file_path):
     """获取文件类型"""
-    file_ext = os.path.splitext(file_path)[1].lower()
-    
-    # 音频格式
-    audio_formats = {'.mp3', '.wav', '.m4a', '.aac', '.ogg', '.flac', '.wma'}
-    # 视频格式
-    video_formats = {'.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm', '.m4v', '.3gp'}
+    path = file_path.lower()
     
-    if file_ext in audio_formats:
+    if path.endswith(AUDIO_SUFFIXES):
         return 'audio'
-    elif file_ext in video_formats:
+    elif path.endswith(VIDEO_SUFFIXES):
         return 'video'
     else:
         return 'unknown'
 
 
-def get_model(model_size="medium", device="cuda", compute_type="float16"):
-    """获取或创建模型实例（带缓存）"""
-    cache_key = f"{model_size}_{device}_{compute_type}"
+def _sse(data: dict) -> bytes:
+    """编码一条 SSE 事件，直接输出 UTF-8 字节，StreamingResponse 无需再次编码"""
+    return b"data: " + orjson.dumps(data) + b"\n\n"
+
+
+async def _keepalive(task: asyncio.Future) -> AsyncGenerator[bytes, None]:
+    """等待任务完成，期间每隔 SSE_KEEPALIVE_INTERVAL 秒产出一条心跳；提前结束时取消任务"""
+    try:
+        while not task.done():
+            done, _ = await asyncio.wait({task}, timeout=SSE_KEEPALIVE_INTERVAL)
+            if not done:
+                yield SSE_KEEPALIVE
+    finally:
+        task.cancel()
+
+
+def _readahead(path: str):
+    """提示内核顺序预读文件（仅支持 POSIX 系统）"""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            # 两个提示是独立的取值而不是标志位，需要分别调用
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+def _ffmpeg_cmd(source: str) -> list:
+    """ffmpeg 解码命令：输出 16kHz 单声道 float32 PCM 到标准输出，跳过视频流"""
+    return [
+        FFMPEG_PATH, "-nostdin", "-threads", str(FFMPEG_THREADS),
+        "-i", source, "-vn",
+        "-f", "f32le", "-ac", "1", "-ar", str(SAMPLE_RATE),
+        "pipe:1",
+    ]
+
+
+def decode_to_np(path: str) -> np.ndarray:
+    """用 ffmpeg 将媒体文件解码为 16kHz 单声道 float32 PCM"""
+    # 提前预读文件到页缓存，ffmpeg 解码时无需等待磁盘；
+    # 预读可能阻塞，因此在工作线程（与模型加载并行）中而不是事件循环中进行
+    _readahead(path)
     
-    if cache_key not in _model_cache:
-        print(f"🔧 正在加载 {model_size} 模型...")
-        _model_cache[cache_key] = WhisperModel(
-            model_size, device=device, compute_type=compute_type
-        )
-        print(f"✅ 模型 {model_size} 加载完成")
+    if FFMPEG_PATH is None:
+        return decode_audio(path, sampling_rate=SAMPLE_RATE)
+    
+    result = subprocess.run(_ffmpeg_cmd(path), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg 解码失败: {result.stderr.decode('utf-8', 'ignore').strip()}")
+    
+    return np.frombuffer(result.stdout, np.float32)
+
+
+def _remove_file(path):
+    """清理临时文件"""
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def _upload_dir(size: Optional[int]) -> Optional[str]:
+    """选择上传文件的临时目录：/dev/shm 存在且空间足够时使用，否则回退到默认临时目录"""
+    if size is None or not os.path.isdir(SHM_DIR):
+        return None
+    if shutil.disk_usage(SHM_DIR).free < size:
+        return None
+    return SHM_DIR
+
+
+async def _iter_upload(file: UploadFile) -> AsyncIterator[bytes]:
+    """分块读取上传文件"""
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        yield chunk
+
+
+async def _pipe_decode(chunks: AsyncIterator[bytes], sink=None) -> np.ndarray:
+    """将内容边读取边写入 ffmpeg 标准输入解码；sink 不为空时同时写入一份完整副本"""
+    proc = await asyncio.create_subprocess_exec(
+        *_ffmpeg_cmd("pipe:0"),
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    
+    try:
+        return await _decode_with_ffmpeg(proc, chunks, sink)
+    except BaseException:
+        # 请求被取消或解码出错时结束 ffmpeg，避免残留子进程
+        if proc.returncode is None:
+            proc.kill()
+        await proc.wait()
+        raise
+
+
+async def _decode_with_ffmpeg(proc: asyncio.subprocess.Process, chunks: AsyncIterator[bytes], sink) -> np.ndarray:
+    """边向 ffmpeg 写入内容边读取解码结果"""
+    async def feed():
+        writable = True
+        try:
+            async for chunk in chunks:
+                if sink is not None:
+                    sink.write(chunk)
+                if not writable:
+                    continue
+                try:
+                    proc.stdin.write(chunk)
+                    await proc.stdin.drain()
+                except (BrokenPipeError, ConnectionResetError):
+                    # ffmpeg 提前退出，错误信息从 stderr 中获取；有副本时继续接收剩余内容
+                    writable = False
+                    if sink is None:
+                        break
+        finally:
+            proc.stdin.close()
     
-    return _model_cache[cache_key]
+    # 写入与读取同时进行，避免管道缓冲区写满后互相等待
+    _, pcm, err = await asyncio.gather(feed(), proc.stdout.read(), proc.stderr.read())
+    if await proc.wait() != 0:
+        raise RuntimeError(f"ffmpeg 解码失败: {err.decode('utf-8', 'ignore').strip()}")
+    
+    return np.frombuffer(pcm, np.float32)
+
+
+async def decode_upload(file: UploadFile) -> np.ndarray:
+    """解码 multipart 上传的文件
+    
+    Starlette 在调用接口前已经把整个请求体缓冲到临时文件，因此这里无法边接收边解码，
+    只省去再写一次临时文件；需要边上传边解码时使用 /asr/stream
+    """
+    # 没有 ffmpeg 或容器需要随机读取时，用 PyAV 直接解码上传的文件对象
+    if FFMPEG_PATH is None or Path(file.filename or "").suffix.lower() in SEEKABLE_SUFFIXES:
+        return await asyncio.to_thread(decode_audio, file.file, sampling_rate=SAMPLE_RATE)
+    
+    try:
+        return await _pipe_decode(_iter_upload(file))
+    except RuntimeError:
+        # 扩展名未知或错误的 MP4 等无法从管道解码，回到文件开头改用 PyAV 随机读取
+        await file.seek(0)
+        return await asyncio.to_thread(decode_audio, file.file, sampling_rate=SAMPLE_RATE)
+
+
+async def decode_request_stream(chunks: AsyncIterator[bytes], suffix: str, size: Optional[int]) -> np.ndarray:
+    """边接收请求体边解码：内容同时写入 ffmpeg 和临时文件（优先内存文件系统）
+    
+    容器需要随机读取（MP4 等）或管道解码失败时，等内容接收完后由 ffmpeg 从临时文件解码
+    """
+    tmp_file = tempfile.NamedTemporaryFile(delete=False, dir=_upload_dir(size), suffix=suffix)
+    try:
+        with tmp_file:
+            if FFMPEG_PATH is not None and suffix not in SEEKABLE_SUFFIXES:
+                try:
+                    return await _pipe_decode(chunks, tmp_file)
+                except RuntimeError:
+                    pass
+            else:
+                async for chunk in chunks:
+                    tmp_file.write(chunk)
+        
+        # 关闭后再按路径解码（Windows 上无法打开仍被占用的临时文件）
+        return await asyncio.to_thread(decode_to_np, tmp_file.name)
+    finally:
+        _remove_file(tmp_file.name)
+
+
+@dataclass(frozen=True)
+class ModelConfig:
+    """模型配置，同时作为模型缓存的键"""
+    model_size: str = "medium"
+    device: str = "cuda"
+    compute_type: str = "int8_float16"
+
+
+def default_config() -> ModelConfig:
+    """服务端默认模型配置：启动时通过命令行参数指定，未指定时使用 ModelConfig 的默认值"""
+    value = os.environ.get(MODEL_CONFIG_ENV)
+    return ModelConfig(*value.split(",")) if value else ModelConfig()
+
+
+def _request_config(model_size: Optional[str], device: Optional[str], compute_type: Optional[str]) -> ModelConfig:
+    """请求中未指定的模型参数使用服务端默认配置"""
+    default = default_config()
+    return ModelConfig(
+        model_size or default.model_size,
+        device or default.device,
+        compute_type or default.compute_type
+    )
+
+
+def _load_model(cfg: ModelConfig) -> WhisperModel:
+    """加载模型"""
+    print(f"🔧 正在加载 {cfg.model_size} 模型...")
+    model = WhisperModel(cfg.model_size, device=cfg.device, compute_type=cfg.compute_type)
+    print(f"✅ 模型 {cfg.model_size} 加载完成")
+    return model
+
+
+def get_model(cfg: ModelConfig = ModelConfig()) -> WhisperModel:
+    """获取或创建模型实例（带缓存，线程安全）"""
+    # 已加载的模型直接返回，不需要加锁
+    model = _model_cache.get(cfg)
+    if model is not None:
+        return model
+    
+    with _model_locks_guard:
+        lock = _model_locks.setdefault(cfg, threading.Lock())
+    
+    # 只有同一配置的加载过程互斥
+    with lock:
+        model = _model_cache.get(cfg)
+        if model is None:
+            model = _load_model(cfg)
+            with _model_locks_guard:
+                _model_cache[cfg] = model
+                while len(_model_cache) > MODEL_CACHE_SIZE:
+                    _model_cache.pop(next(iter(_model_cache)))
+    
+    return model
+
+
+async def get_model_async(cfg: ModelConfig = ModelConfig()) -> WhisperModel:
+    """异步获取模型实例，加载在工作线程中进行，同一模型的并发请求排队等待"""
+    model = _model_cache.get(cfg)
+    if model is not None:
+        return model
+    
+    async with _model_async_locks.setdefault(cfg, asyncio.Lock()):
+        return await asyncio.to_thread(get_model, cfg)
+
+
+def _transcribe_batch(cfg: ModelConfig, language: str, beam_size: int, audios: list) -> list:
+    """将多个请求的音频合并送入 CTranslate2，按请求顺序返回各自的 (转录段, 转录信息)"""
+    pipeline = BatchedInferencePipeline(get_model(cfg))
+    return pipeline.transcribe_many(
+        audios,
+        batch_size=BATCH_SIZE,
+        beam_size=beam_size,
+        best_of=beam_size,
+        language=language,
+        vad_parameters=VAD_PARAMETERS,
+        condition_on_previous_text=False
+    )
+
+
+class BatchScheduler:
+    """跨请求微批处理：在短时间窗口内收集并发请求的音频，合并为一次批量推理"""
+    
+    def __init__(self, max_batch: int = BATCH_MAX_REQUESTS, window: float = BATCH_WINDOW):
+        self.max_batch = max_batch
+        self.window = window
+        self._queue: Optional[asyncio.Queue] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    async def submit(self, cfg: ModelConfig, language: str, beam_size: int, audio: np.ndarray):
+        """提交一个请求的音频，等待所在批次完成后返回其 (转录段, 转录信息)"""
+        # 后台任务尚未启动、已经结束，或事件循环已更换（服务重启、新的 asyncio.run）时重新创建
+        loop = asyncio.get_running_loop()
+        if self._runner is None or self._runner.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._runner = loop.create_task(self._run())
+        
+        future = loop.create_future()
+        await self._queue.put((cfg, language, beam_size, audio, future))
+        return await future
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # 等到第一个请求后，在窗口内继续收集，直到凑满一批
+            items = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(items) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            # 只有模型、语言和集束大小都相同的请求才能合并
+            groups = {}
+            for item in items:
+                groups.setdefault(item[:3], []).append(item)
+            
+            for key, group in groups.items():
+                try:
+                    results = await asyncio.to_thread(_transcribe_batch, *key, [item[3] for item in group])
+                except Exception as e:
+                    for item in group:
+                        if not item[4].done():
+                            item[4].set_exception(e)
+                    continue
+                
+                for item, result in zip(group, results):
+                    if not item[4].done():
+                        item[4].set_result(result)
+
+
+_batch_scheduler = BatchScheduler()
 
 
 async def transcribe_media_stream(
     media_path: str,
-    model_size: str = "medium",
-    device: str = "cuda", 
-    compute_type: str = "float16",
-    beam_size: int = 5,
-    language: str = "zh"
-) -> AsyncGenerator[str, None]:
-    """流式转录媒体文件，实时返回结果"""
+    cfg: ModelConfig = ModelConfig(),
+    beam_size: int = 1,
+    language: str = "zh",
+    vad_filter: bool = True,
+    batched: bool = False
+) -> AsyncGenerator[bytes, None]:
+    """流式转录媒体文件，实时返回结果；batched 为 True 时与并发请求合并推理"""
     
     # 检查文件是否存在
     if not os.path.exists(media_path):
         raise FileNotFoundError(f"媒体文件不存在: {media_path}")
     
+    async for chunk in transcribe_audio_stream(
+        os.path.basename(media_path),
+        lambda: asyncio.to_thread(decode_to_np, media_path),
+        cfg, beam_size, language, vad_filter, batched
+    ):
+        yield chunk
+
+
+async def transcribe_audio_stream(
+    file_name: str,
+    load_audio: Callable[[], Awaitable[np.ndarray]],
+    cfg: ModelConfig = ModelConfig(),
+    beam_size: int = 1,
+    language: str = "zh",
+    vad_filter: bool = True,
+    batched: bool = False,
+    model_task: Optional[asyncio.Task] = None
+) -> AsyncGenerator[bytes, None]:
+    """流式转录音频，load_audio 返回解码后的 16kHz PCM；供本地文件与上传文件共用
+    
+    model_task 为调用方已开始加载模型的任务，未提供时在此处加载
+    """
+    
     # 检测文件类型
-    file_type = get_file_type(media_path)
+    file_type = get_file_type(file_name)
     
     # 发送开始信息
     start_info = {
         "type": "start",
-        "file_name": os.path.basename(media_path),
+        "file_name": file_name,
         "file_type": file_type,
         "timestamp": time.time()
     }
-    yield f"data: {json.dumps(start_info, ensure_ascii=False)}\n\n"
+    yield _sse(start_info)
+    
+    # 转录段的发送缓冲区；start/language_detected/complete 事件不经过缓冲，立即发送
+    buffer = bytearray()
     
     try:
-        # 获取模型
-        model = get_model(model_size, device, compute_type)
-        
         # 记录开始时间
         start_time = time.time()
         
-        # 转录媒体文件
-        segments, info = model.transcribe(media_path, beam_size=beam_size, language=language)
+        if batched:
+            # 与其他并发请求合并为一次批量推理，整个文件完成后一次性得到所有段；
+            # 等待期间（各组依次推理，可能很久）发送心跳保持连接
+            async def transcribe_batched():
+                return await _batch_scheduler.submit(cfg, language, beam_size, await load_audio())
+            
+            batch = asyncio.ensure_future(transcribe_batched())
+            async for keepalive in _keepalive(batch):
+                yield keepalive
+            segments, info = batch.result()
+        else:
+            # 获取模型与解码音频同时进行（首次加载模型较慢，解码在工作线程中与之重叠）
+            model, audio = await asyncio.gather(
+                model_task or get_model_async(cfg),
+                load_audio()
+            )
+            
+            # 转录音频（语言检测同样在工作线程中进行）
+            # VAD 跳过静音/音乐片段，计算量只与有效语音时长相关；
+            # 不以前文为条件，避免长音频出现重复时解码上下文不断膨胀
+            segments, info = await asyncio.to_thread(
+                model.transcribe,
+                audio,
+                beam_size=beam_size,
+                best_of=beam_size,
+                language=language,
+                vad_filter=vad_filter,
+                vad_parameters=VAD_PARAMETERS,
+                condition_on_previous_text=False
+            )
         
         # 发送语言检测信息
         lang_info = {
@@ -91,12 +491,29 @@ async def transcribe_media_stream(
             "language_probability": float(info.language_probability),
             "timestamp": time.time()
         }
-        yield f"data: {json.dumps(lang_info, ensure_ascii=False)}\n\n"
+        yield _sse(lang_info)
         
         # 实时处理每个音频段
         segment_count = 0
+        last_flush = time.monotonic()
         
-        for segment in segments:
+        # 每一步解码都在工作线程中执行，事件循环可以继续服务其他连接
+        segments = iter(segments)
+        while True:
+            next_segment = asyncio.ensure_future(asyncio.to_thread(next, segments, None))
+            
+            # 缓冲区里有待发送的段时，最多等到刷新窗口结束，超时先把已有的段发出去
+            if buffer:
+                remaining = SSE_FLUSH_INTERVAL - (time.monotonic() - last_flush)
+                done, _ = await asyncio.wait({next_segment}, timeout=max(remaining, 0))
+                if not done:
+                    yield bytes(buffer)
+                    buffer.clear()
+                    last_flush = time.monotonic()
+            
+            segment = await next_segment
+            if segment is None:
+                break
             segment_count += 1
             
             # 发送转录段结果
@@ -108,10 +525,17 @@ async def transcribe_media_stream(
                 "text": segment.text,
                 "timestamp": time.time()
             }
-            yield f"data: {json.dumps(segment_data, ensure_ascii=False)}\n\n"
+            buffer += _sse(segment_data)
             
-            # 让出控制权，允许其他任务执行
-            await asyncio.sleep(0.01)
+            # 攒够一定大小或超过刷新间隔才写出，减少小块写入的次数
+            if len(buffer) >= SSE_FLUSH_BYTES or time.monotonic() - last_flush >= SSE_FLUSH_INTERVAL:
+                yield bytes(buffer)
+                buffer.clear()
+                last_flush = time.monotonic()
+        
+        if buffer:
+            yield bytes(buffer)
+            buffer.clear()
         
         # 计算总耗时
         end_time = time.time()
@@ -125,16 +549,73 @@ async def transcribe_media_stream(
             "file_type": file_type,
             "timestamp": time.time()
         }
-        yield f"data: {json.dumps(complete_info, ensure_ascii=False)}\n\n"
+        yield _sse(complete_info)
         
     except Exception as e:
-        # 发送错误信息
+        # 先发出已缓冲的段，再发送错误信息
+        if buffer:
+            yield bytes(buffer)
         error_info = {
             "type": "error",
             "error_message": str(e),
             "timestamp": time.time()
         }
-        yield f"data: {json.dumps(error_info, ensure_ascii=False)}\n\n"
+        yield _sse(error_info)
+
+
+async def _gzip_stream(stream: AsyncGenerator[bytes, None]) -> AsyncGenerator[bytes, None]:
+    """gzip 压缩 SSE 流，每个块都做同步刷新，压缩不会推迟事件送达"""
+    compressor = zlib.compressobj(SSE_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    try:
+        async for chunk in stream:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+    finally:
+        await stream.aclose()
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """解析 Accept-Encoding，gzip（未列出时按 *）的 q 值大于 0 才使用 gzip"""
+    qualities = {}
+    for token in accept_encoding.split(","):
+        coding, *params = token.split(";")
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding.strip().lower()] = q
+    
+    q = qualities.get("gzip", qualities.get("x-gzip", qualities.get("*", 0.0)))
+    return q > 0
+
+
+def _sse_response(request: Request, stream: AsyncGenerator[bytes, None]) -> StreamingResponse:
+    """构建 SSE 响应，客户端支持 gzip 时压缩传输"""
+    headers = dict(SSE_HEADERS)
+    if _accepts_gzip(request.headers.get("accept-encoding", "")):
+        stream = _gzip_stream(stream)
+        headers["Content-Encoding"] = "gzip"
+    else:
+        headers["Content-Encoding"] = "identity"
+    
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers=headers
+    )
+
+
+@app.on_event("startup")
+async def warmup():
+    """启动时预加载默认模型，避免首个请求等待模型加载"""
+    try:
+        await get_model_async(default_config())
+    except Exception as e:
+        print(f"⚠️  默认模型预加载失败: {e}")
 
 
 @app.get("/")
@@ -143,88 +624,222 @@ async def root():
     return {"message": "🎵 语音转录服务运行中", "version": "1.0.0"}
 
 
+def _check_batched(batched: bool, vad_filter: bool):
+    """批量推理依赖 VAD 将音频切分为不超过 30 秒的片段，不能与关闭 VAD 同时使用"""
+    if batched and not vad_filter:
+        raise HTTPException(status_code=400, detail="batched 模式需要开启 vad_filter")
+
+
 @app.get("/asr")
 async def transcribe_by_path(
+    request: Request,
     media_path: str = Query(..., description="媒体文件的完整路径"),
-    model_size: str = Query("medium", description="模型大小 (small/medium/large-v3)"),
-    device: str = Query("cuda", description="设备类型 (cuda/cpu)"),
-    compute_type: str = Query("float16", description="计算类型 (float16/int8_float16/int8)"),
-    beam_size: int = Query(5, description="集束搜索大小"),
-    language: str = Query("zh", description="语言代码")
+    model_size: Optional[str] = Query(None, description="模型大小 (small/medium/large-v3)，默认使用服务启动时的配置"),
+    device: Optional[str] = Query(None, description="设备类型 (cuda/cpu)，默认使用服务启动时的配置"),
+    compute_type: Optional[str] = Query(None, description="计算类型 (float16/int8_float16/int8)，默认使用服务启动时的配置"),
+    beam_size: int = Query(1, description="集束搜索大小 (1 为贪心解码，最快)"),
+    language: str = Query("zh", description="语言代码"),
+    vad_filter: bool = Query(True, description="是否使用 VAD 跳过非语音片段"),
+    batched: bool = Query(False, description="与其他并发请求合并批量推理（转录完成后一次性返回所有段）")
 ):
     """通过文件路径进行语音转录 (Server-Sent Events)"""
     
-    return StreamingResponse(
+    _check_batched(batched, vad_filter)
+    
+    return _sse_response(
+        request,
         transcribe_media_stream(
             media_path=media_path,
-            model_size=model_size,
-            device=device,
-            compute_type=compute_type,
+            cfg=_request_config(model_size, device, compute_type),
             beam_size=beam_size,
-            language=language
-        ),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Headers": "*",
-        }
+            language=language,
+            vad_filter=vad_filter,
+            batched=batched
+        )
+    )
+
+async def _upload_response(
+    request: Request,
+    file_name: str,
+    decode: Awaitable[np.ndarray],
+    cfg: ModelConfig,
+    beam_size: int,
+    language: str,
+    vad_filter: bool,
+    batched: bool
+) -> StreamingResponse:
+    """解码上传内容后返回 SSE 响应；解码的同时开始加载模型，首次加载模型的耗时与解码重叠
+    
+    请求体只能在接口返回前读取，因此解码在返回响应前完成，start 事件在解码结束后才发送
+    """
+    model_task = None if batched else asyncio.create_task(get_model_async(cfg))
+    try:
+        audio = await decode
+    except Exception as e:
+        if model_task is not None:
+            model_task.cancel()
+        raise HTTPException(status_code=400, detail=f"音频解码失败: {e}")
+    
+    async def load_audio():
+        return audio
+    
+    return _sse_response(
+        request,
+        transcribe_audio_stream(
+            file_name,
+            load_audio,
+            cfg=cfg,
+            beam_size=beam_size,
+            language=language,
+            vad_filter=vad_filter,
+            batched=batched,
+            model_task=model_task
+        )
     )
 
+
 # 【预留方案】直接上传文件到服务端，进行转录
 @app.post("/asr/upload")
 async def transcribe_by_upload(
+    request: Request,
     file: UploadFile = File(...),
-    model_size: str = Query("medium", description="模型大小"),
-    device: str = Query("cuda", description="设备类型"),
-    compute_type: str = Query("float16", description="计算类型"),
-    beam_size: int = Query(5, description="集束搜索大小"),
-    language: str = Query("zh", description="语言代码")
+    model_size: Optional[str] = Query(None, description="模型大小，默认使用服务启动时的配置"),
+    device: Optional[str] = Query(None, description="设备类型，默认使用服务启动时的配置"),
+    compute_type: Optional[str] = Query(None, description="计算类型，默认使用服务启动时的配置"),
+    beam_size: int = Query(1, description="集束搜索大小 (1 为贪心解码，最快)"),
+    language: str = Query("zh", description="语言代码"),
+    vad_filter: bool = Query(True, description="是否使用 VAD 跳过非语音片段"),
+    batched: bool = Query(False, description="与其他并发请求合并批量推理（转录完成后一次性返回所有段）")
 ):
-    """通过文件上传进行语音转录 (Server-Sent Events)"""
+    """通过 multipart 文件上传进行语音转录 (Server-Sent Events)"""
     
-    # 保存上传的文件到临时目录
-    with tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix) as tmp_file:
-        content = await file.read()
-        tmp_file.write(content)
-        temp_path = tmp_file.name
+    _check_batched(batched, vad_filter)
     
-    try:
-        return StreamingResponse(
-            transcribe_media_stream(
-                media_path=temp_path,
-                model_size=model_size,
-                device=device,
-                compute_type=compute_type,
-                beam_size=beam_size,
-                language=language
-            ),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Headers": "*",
-            }
-        )
-    finally:
-        # 清理临时文件
-        try:
-            os.unlink(temp_path)
-        except:
-            pass
+    return await _upload_response(
+        request,
+        file.filename or "upload",
+        decode_upload(file),
+        _request_config(model_size, device, compute_type),
+        beam_size,
+        language,
+        vad_filter,
+        batched
+    )
 
 
-if __name__ == "__main__":
-    print("🚀 启动语音转录服务...")
+@app.post("/asr/stream")
+async def transcribe_by_stream(
+    request: Request,
+    file_name: str = Query("upload", description="文件名（用于判断文件类型与容器格式）"),
+    model_size: Optional[str] = Query(None, description="模型大小，默认使用服务启动时的配置"),
+    device: Optional[str] = Query(None, description="设备类型，默认使用服务启动时的配置"),
+    compute_type: Optional[str] = Query(None, description="计算类型，默认使用服务启动时的配置"),
+    beam_size: int = Query(1, description="集束搜索大小 (1 为贪心解码，最快)"),
+    language: str = Query("zh", description="语言代码"),
+    vad_filter: bool = Query(True, description="是否使用 VAD 跳过非语音片段"),
+    batched: bool = Query(False, description="与其他并发请求合并批量推理（转录完成后一次性返回所有段）")
+):
+    """上传原始文件内容（application/octet-stream）进行语音转录 (Server-Sent Events)
+    
+    请求体边接收边送入 ffmpeg 解码，不经过 multipart 解析和磁盘临时文件
+    """
+    
+    _check_batched(batched, vad_filter)
+    
+    content_length = request.headers.get("content-length", "")
+    size = int(content_length) if content_length.isdigit() else None
+    
+    return await _upload_response(
+        request,
+        file_name,
+        decode_request_stream(request.stream(), Path(file_name).suffix.lower(), size),
+        _request_config(model_size, device, compute_type),
+        beam_size,
+        language,
+        vad_filter,
+        batched
+    )
+
+
+def transcribe_local(
+    media_path: str,
+    cfg: ModelConfig,
+    beam_size: int = 1,
+    language: str = "zh",
+    vad_filter: bool = True
+):
+    """不启动服务，直接在本地转录并打印结果（与服务端共用同一个转录流程）"""
+    
+    async def consume():
+        async for chunk in transcribe_media_stream(media_path, cfg, beam_size, language, vad_filter):
+            for line in chunk.split(b"\n"):
+                if line.startswith(b"data: "):
+                    _print_event(orjson.loads(line[6:]))
+    
+    asyncio.run(consume())
+
+
+def _print_event(data: dict):
+    """打印本地转录的事件"""
+    event_type = data.get("type")
+    
+    if event_type == "language_detected":
+        print("Detected language '%s' with probability %f" % (data["language"], data["language_probability"]))
+    elif event_type == "segment":
+        print("[%.2fs -> %.2fs] %s" % (data["start_time"], data["end_time"], data["text"]))
+    elif event_type == "complete":
+        minutes, seconds = divmod(int(data["elapsed_time"]), 60)
+        print(f"\n总耗时: {minutes}分钟{seconds}秒")
+    elif event_type == "error":
+        print(f"❌ 转录失败: {data['error_message']}")
+
+
+def main():
+    """主函数：不指定媒体文件时启动服务，否则直接在本地转录"""
+    parser = argparse.ArgumentParser(description="语音转录服务")
+    parser.add_argument("media_path", nargs="?", help="媒体文件路径（指定后不启动服务，直接在本地转录）")
+    parser.add_argument("--model", default="medium", choices=["small", "medium", "large-v3"], help="模型大小（启动服务时作为默认模型并预加载）")
+    parser.add_argument("--device", default="cuda", choices=["cuda", "cpu"], help="设备类型")
+    parser.add_argument("--compute-type", default="int8_float16", choices=["float16", "int8_float16", "int8"], help="计算类型")
+    parser.add_argument("--beam-size", type=int, help="集束搜索大小（仅本地转录，默认 1）")
+    parser.add_argument("--language", help="语言代码（仅本地转录，默认 zh）")
+    parser.add_argument("--no-vad", action="store_true", help="关闭 VAD，转录完整音频（包括静音片段，仅本地转录）")
+    parser.add_argument("--workers", type=int, default=1, help="服务进程数（每个进程各自加载模型，需确保显存足够）")
+    
+    args = parser.parse_args()
+    cfg = ModelConfig(args.model, args.device, args.compute_type)
+    
+    if args.media_path:
+        transcribe_local(args.media_path, cfg, args.beam_size or 1, args.language or "zh", not args.no_vad)
+        return
+    
+    # 集束大小、语言和 VAD 由每个请求的参数指定，启动服务时不接受
+    if args.beam_size is not None or args.language is not None or args.no_vad:
+        parser.error("--beam-size/--language/--no-vad 仅用于本地转录，服务端由请求参数指定")
+    
+    # 模型配置作为服务端默认值并在启动时预加载；经环境变量传递，多进程时每个进程都能读取
+    os.environ[MODEL_CONFIG_ENV] = ",".join(astuple(cfg))
+    
+    print(f"🚀 启动语音转录服务（默认模型: {cfg.model_size}, {cfg.device}, {cfg.compute_type}）...")
+    # loop/http 为 auto 时，已安装 uvloop/httptools（uvicorn[standard]）就会使用它们，Windows 上自动回退到 asyncio
+    # 多进程需要以导入路径启动应用；每个进程有自己的模型缓存，音频解码可以与另一个请求的 GPU 推理重叠
     uvicorn.run(
-        app, 
+        f"{Path(__file__).stem}:app" if args.workers > 1 else app,
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
         host="0.0.0.0", 
         port=8000,
+        loop="auto",
+        http="auto",
+        workers=args.workers,
         log_level="info"
     )
 
 
+if __name__ == "__main__":
+    main()
+
+
 # 指令示例：
 # .\venv_faster_whisper\Scripts\python .\run.py
+# .\venv_faster_whisper\Scripts\python .\run.py --workers 2
+# .\venv_faster_whisper\Scripts\python .\run.py audio.mp3 --model medium
@@ -57,9 +57,13 @@ setup(
         "conversion": conversion_requires,
         "dev": [
             "black==23.*",
+            "fastapi>=0.104.0",
             "flake8==6.*",
             "isort==5.*",
+            "orjson>=3.9.0",
             "pytest==7.*",
+            "python-multipart>=0.0.6",
+            "uvicorn>=0.24.0",
         ],
     },
     packages=find_packages(),
@@ -0,0 +1,219 @@
+import asyncio
+import os
+import sys
+import time
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+# run.py is the server script at the repository root, not part of the package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import run  # noqa: E402
+
+TINY = run.ModelConfig("tiny", "cpu", "int8")
+SMALL = run.ModelConfig("small", "cpu", "int8")
+
+
+@pytest.fixture
+def batch_calls(monkeypatch):
+    calls = []
+
+    def fake_transcribe_batch(cfg, language, beam_size, audios):
+        calls.append((cfg, language, beam_size, list(audios)))
+        return [(f"{language}:{audio}", cfg) for audio in audios]
+
+    monkeypatch.setattr(run, "_transcribe_batch", fake_transcribe_batch)
+    return calls
+
+
+def test_batch_scheduler_groups_by_key(batch_calls):
+    scheduler = run.BatchScheduler(max_batch=8, window=0.05)
+
+    async def main():
+        return await asyncio.gather(
+            scheduler.submit(TINY, "en", 1, "a"),
+            scheduler.submit(TINY, "zh", 1, "b"),
+            scheduler.submit(TINY, "en", 1, "c"),
+            scheduler.submit(SMALL, "en", 1, "d"),
+            scheduler.submit(TINY, "en", 5, "e"),
+        )
+
+    results = asyncio.run(main())
+
+    assert results == [
+        ("en:a", TINY),
+        ("zh:b", TINY),
+        ("en:c", TINY),
+        ("en:d", SMALL),
+        ("en:e", TINY),
+    ]
+    assert sorted(batch_calls, key=str) == sorted(
+        [
+            (TINY, "en", 1, ["a", "c"]),
+            (TINY, "zh", 1, ["b"]),
+            (SMALL, "en", 1, ["d"]),
+            (TINY, "en", 5, ["e"]),
+        ],
+        key=str,
+    )
+
+
+def test_batch_scheduler_window(batch_calls):
+    scheduler = run.BatchScheduler(max_batch=2, window=0.05)
+
+    async def main():
+        # The first two requests fill a batch, the third one starts a new window.
+        first = await asyncio.gather(
+            scheduler.submit(TINY, "en", 1, "a"),
+            scheduler.submit(TINY, "en", 1, "b"),
+            scheduler.submit(TINY, "en", 1, "c"),
+        )
+
+        # A request arriving after the window has closed is not merged.
+        late = asyncio.ensure_future(scheduler.submit(TINY, "en", 1, "d"))
+        await asyncio.sleep(0.2)
+        second = await asyncio.gather(late, scheduler.submit(TINY, "en", 1, "e"))
+        return first + second
+
+    results = asyncio.run(main())
+
+    assert [text for text, _ in results] == ["en:a", "en:b", "en:c", "en:d", "en:e"]
+    assert [audios for _, _, _, audios in batch_calls] == [
+        ["a", "b"],
+        ["c"],
+        ["d"],
+        ["e"],
+    ]
+
+
+def test_batch_scheduler_propagates_exceptions(monkeypatch):
+    def failing_transcribe_batch(cfg, language, beam_size, audios):
+        if language == "en":
+            raise RuntimeError("decode failed")
+        return [("ok", None) for _ in audios]
+
+    monkeypatch.setattr(run, "_transcribe_batch", failing_transcribe_batch)
+    scheduler = run.BatchScheduler(max_batch=8, window=0.05)
+
+    async def main():
+        results = await asyncio.gather(
+            scheduler.submit(TINY, "en", 1, "a"),
+            scheduler.submit(TINY, "en", 1, "b"),
+            scheduler.submit(TINY, "zh", 1, "c"),
+            return_exceptions=True,
+        )
+        # The scheduler keeps serving requests after a failed batch.
+        return results + [await scheduler.submit(TINY, "zh", 1, "d")]
+
+    first, second, third, after = asyncio.run(main())
+
+    assert isinstance(first, RuntimeError)
+    assert isinstance(second, RuntimeError)
+    assert third == ("ok", None)
+    assert after == ("ok", None)
+
+
+def test_batched_stream_sends_keepalive(monkeypatch):
+    def slow_transcribe_batch(cfg, language, beam_size, audios):
+        time.sleep(0.3)
+        info = SimpleNamespace(language=language, language_probability=0.9)
+        return [
+            ([SimpleNamespace(start=0.0, end=1.0, text="ok")], info) for _ in audios
+        ]
+
+    monkeypatch.setattr(run, "_transcribe_batch", slow_transcribe_batch)
+    monkeypatch.setattr(run, "_batch_scheduler", run.BatchScheduler(window=0.01))
+    monkeypatch.setattr(run, "SSE_KEEPALIVE_INTERVAL", 0.05)
+
+    async def load_audio():
+        return "audio"
+
+    async def main():
+        stream = run.transcribe_audio_stream("a.wav", load_audio, TINY, batched=True)
+        return [chunk async for chunk in stream]
+
+    chunks = asyncio.run(main())
+
+    assert chunks[0].startswith(b"data: ")
+    assert chunks[1] == run.SSE_KEEPALIVE
+    events = [chunk for chunk in chunks if chunk != run.SSE_KEEPALIVE]
+    assert b'"type":"start"' in events[0]
+    assert b'"type":"language_detected"' in events[1]
+    assert b'"text":"ok"' in b"".join(events)
+    assert b'"type":"complete"' in events[-1]
+
+
+@pytest.mark.parametrize(
+    "accept_encoding,expected",
+    [
+        ("", False),
+        ("gzip", True),
+        ("gzip, deflate, br", True),
+        ("deflate, GZIP;q=0.5", True),
+        ("gzip;q=0", False),
+        ("gzip; q=0.0, deflate", False),
+        ("br, *", True),
+        ("*;q=0", False),
+        ("*, gzip;q=0", False),
+        ("identity", False),
+    ],
+)
+def test_accepts_gzip(accept_encoding, expected):
+    assert run._accepts_gzip(accept_encoding) is expected
+
+
+def test_batch_scheduler_restarts_runner(batch_calls):
+    scheduler = run.BatchScheduler(window=0.01)
+
+    async def submit(audio):
+        return await scheduler.submit(TINY, "en", 1, audio)
+
+    # Each asyncio.run uses a new event loop.
+    assert asyncio.run(submit("a")) == ("en:a", TINY)
+    assert asyncio.run(submit("b")) == ("en:b", TINY)
+
+    async def main():
+        await submit("c")
+        scheduler._runner.cancel()
+        await asyncio.sleep(0)
+        return await submit("d")
+
+    assert asyncio.run(main()) == ("en:d", TINY)
+
+
+FAKE_FFMPEG = """
+import sys
+source = sys.argv[1]
+data = sys.stdin.buffer.read() if source == "pipe:0" else open(source, "rb").read()
+if data.startswith(b"MP4"):
+    if source == "pipe:0":
+        sys.exit("moov atom not found")
+    data = data[3:]
+sys.stdout.buffer.write(data)
+"""
+
+
+@pytest.mark.parametrize("file_name", ["a.wav", "clip", "clip.mp4"])
+def test_decode_request_stream(monkeypatch, tmp_path, file_name):
+    monkeypatch.setattr(run, "FFMPEG_PATH", sys.executable)
+    monkeypatch.setattr(
+        run, "_ffmpeg_cmd", lambda source: [sys.executable, "-c", FAKE_FFMPEG, source]
+    )
+    monkeypatch.setattr(run, "SHM_DIR", str(tmp_path))
+
+    pcm = np.arange(1000, dtype=np.float32)
+    # Containers that cannot be read from a pipe are decoded from the spooled copy.
+    content = pcm.tobytes() if file_name.endswith(".wav") else b"MP4" + pcm.tobytes()
+
+    async def chunks():
+        for i in range(0, len(content), 1000):
+            yield content[i : i + 1000]
+
+    suffix = os.path.splitext(file_name)[1]
+    audio = asyncio.run(run.decode_request_stream(chunks(), suffix, len(content)))
+
+    np.testing.assert_array_equal(audio, pcm)
+    assert os.listdir(tmp_path) == []
@@ -88,6 +88,27 @@ def test_batched_transcribe(physcisworks_path):
     assert len(segments) > 7
 
 
+def test_batched_transcribe_many(jfk_path, physcisworks_path):
+    model = WhisperModel("tiny")
+    batched_model = BatchedInferencePipeline(model=model)
+    empty_audio = np.asarray([], dtype="float32")
+    results = batched_model.transcribe_many(
+        [jfk_path, empty_audio, physcisworks_path], batch_size=16, language="en"
+    )
+    assert len(results) == 3
+
+    for audio, (segments, info) in zip([jfk_path, physcisworks_path], results[::2]):
+        expected, expected_info = batched_model.transcribe(
+            audio, batch_size=16, language="en"
+        )
+        assert info.duration == expected_info.duration
+        assert [(s.start, s.end, s.text) for s in segments] == [
+            (s.start, s.end, s.text) for s in expected
+        ]
+
+    assert results[1][0] == []
+
+
 def test_empty_audio():
     audio = np.asarray([], dtype="float32")
     model = WhisperModel("tiny")